@@ -18,22 +18,58 @@
 
 
 import subprocess
-import json
 import argparse
-
-x265_valid_color_matrix = [
+import hashlib
+import os
+from types import MappingProxyType
+from typing import Any, Callable
+from sys import intern
+
+# orjson parses JSON with SIMD-accelerated native code, well ahead of the
+# stdlib parser; fall back to stdlib json when it is not installed.
+# The names are declared up front so both branches assign the same type.
+json_loads: Callable[[Any], Any]
+json_dumps: Callable[[Any], bytes]
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    import json
+    json_loads = json.loads
+
+    def stdlib_json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    json_dumps = stdlib_json_dumps
+
+
+# The lookup tables below live for the whole process, so their keys are
+# interned to give dict probes CPython's pointer-compare fast path, and the
+# tables are frozen so nothing can mutate them at runtime.
+def frozen_table(table: dict) -> MappingProxyType:
+    return MappingProxyType({intern(key): value for key, value in table.items()})
+
+
+x265_valid_color_matrix = frozenset(map(intern, (
     "gbr", "bt709", "unknown", "reserved", "fcc", "bt470bg", "smpte170m", "smpte240m", "ycgco",
     "bt2020nc", "bt2020c", "smpte2085", "chroma-derived-nc", "chroma-derived-c", "ictcp"
-]
+)))
 
 x265_color_matrix_mapping = {"bt2020_ncl": "bt2020nc", "bt2020_cl": "bt2020c"}
 
+# Valid names map to themselves and aliases map to their canonical spelling,
+# so resolving a color matrix is a single dict probe instead of a list scan
+# followed by a second lookup.
+x265_color_matrix = frozen_table(
+    {name: name for name in x265_valid_color_matrix} | x265_color_matrix_mapping)
+
 # aomenc --help
 # https://ffmpeg.org/ffmpeg-codecs.html
-libaom_valid_matrix_coefficients = [
+libaom_valid_matrix_coefficients = frozenset(map(intern, (
     "bt709", "fcc73", "bt470bg", "bt601", "smpte240", "ycgco",
     "bt2020ncl", "bt2020cl", "smpte2085", "chromncl", "chromcl", "ictcp"
-]
+)))
 
 libaom_matrix_coefficients_mapping = {
     "fcc": "fcc73",
@@ -46,18 +82,17 @@ libaom_matrix_coefficients_mapping = {
     "chroma-derived-c": "chromcl"
 }
 
+# Merged identity + alias table, same layout as x265_color_matrix above.
+libaom_matrix_coefficients = frozen_table(
+    {name: name for name in libaom_valid_matrix_coefficients} | libaom_matrix_coefficients_mapping)
 
-def libaom_get_matrix_coefficients(color_space: str) -> str | None:
-    if color_space in libaom_valid_matrix_coefficients:
-        return color_space
-    elif color_space in libaom_matrix_coefficients_mapping:
-        return libaom_matrix_coefficients_mapping[color_space]
 
-    return None
+def libaom_get_matrix_coefficients(color_space: str) -> str | None:
+    return libaom_matrix_coefficients.get(color_space)
 
 
 # https://gitlab.com/AOMediaCodec/SVT-AV1/-/blob/master/Docs/Parameters.md
-libsvtav1_color_primaries_mapping = {
+libsvtav1_color_primaries_mapping = frozen_table({
     "bt709": 1,
     "bt470m": 4,
     "bt470bg": 5,
@@ -69,7 +104,7 @@ libsvtav1_color_primaries_mapping = {
     "smpte431": 11,
     "smpte432": 12,
     "ebu3213": 22
-}
+})
 
 
 def libsvtav1_get_cp_code(color_primaries: str) -> int:
@@ -79,7 +114,7 @@ def libsvtav1_get_cp_code(color_primaries: str) -> int:
 
 # 2: unspecified, default
 # https://gitlab.com/AOMediaCodec/SVT-AV1/-/blob/master/Docs/Parameters.md
-libsvtav1_transfer_characteristics_mapping = {
+libsvtav1_transfer_characteristics_mapping = frozen_table({
     "bt709": 1,
     "bt470m": 4,
     "bt470bg": 5,
@@ -96,7 +131,7 @@ libsvtav1_transfer_characteristics_mapping = {
     "smpte2084": 16,
     "smpte428": 17,
     "hlg": 18
-}
+})
 
 
 def libsvtav1_get_tch_code(transfer_characteristics: str) -> int:
@@ -105,12 +140,15 @@ def libsvtav1_get_tch_code(transfer_characteristics: str) -> int:
 
 
 class MDItem:
-    def __init__(self, raw_val: str):
+    __slots__ = ("raw_value", "numerator", "denominator", "float_value")
+
+    def __init__(self, raw_val: str) -> None:
         self.raw_value: str = raw_val
-        val_list = raw_val.split("/")
-        self.numerator: int = int(val_list[0])
-        self.denominator: int = int(val_list[1])
-        self.float_value = self.numerator / self.denominator
+        # partition() yields the two halves without allocating a list.
+        num, _, den = raw_val.partition("/")
+        self.numerator: int = int(num)
+        self.denominator: int = int(den)
+        self.float_value: float = self.numerator / self.denominator
 
     def __str__(self) -> str:
         return self.raw_value
@@ -124,7 +162,9 @@ class MDItem:
 
 
 class MDItemColorXY:
-    def __init__(self, side_data: dict, prefix: str):
+    __slots__ = ("prefix", "x_data", "y_data")
+
+    def __init__(self, side_data: dict, prefix: str) -> None:
         self.prefix: str = prefix
         self.x_data = MDItem(side_data[prefix + "_x"])
         self.y_data = MDItem(side_data[prefix + "_y"])
@@ -136,11 +176,14 @@ class MDItemColorXY:
         return f"({self.x_data.expand_to_ratio(50000)},{self.y_data.expand_to_ratio(50000)})"
 
     def to_libsvtav1(self) -> str:
-        return f"({round(self.x_data.float_value, 4):.4f},{round(self.y_data.float_value, 4):.4f})"
+        # :.4f already rounds, no need for a round() call on top.
+        return f"({self.x_data.float_value:.4f},{self.y_data.float_value:.4f})"
 
 
 class MasteringDisplayData:
-    def __init__(self, side_data: dict):
+    __slots__ = ("red", "green", "blue", "white_point", "min_luminance", "max_luminance")
+
+    def __init__(self, side_data: dict) -> None:
         self.red = MDItemColorXY(side_data, "red")
         self.green = MDItemColorXY(side_data, "green")
         self.blue = MDItemColorXY(side_data, "blue")
@@ -152,19 +195,23 @@ class MasteringDisplayData:
         return f"{self.red}\n{self.green}\n{self.blue}\n{self.white_point}\n" + \
             f"min_luminance: {self.min_luminance}\nmax_luminance{self.max_luminance}"
 
+    # Adjacent f-string literals are fused at compile time, unlike the
+    # runtime "+" concatenation they replace.
     def to_x265_params(self) -> str:
-        return f"display=G{self.green.to_x265()}B{self.blue.to_x265()}R{self.red.to_x265()}" + \
-            f"WP{self.white_point.to_x265()}" + \
-            f"L({self.max_luminance.expand_to_ratio(10000)},{self.min_luminance.expand_to_ratio(10000)})"
+        return (f"display=G{self.green.to_x265()}B{self.blue.to_x265()}R{self.red.to_x265()}"
+                f"WP{self.white_point.to_x265()}"
+                f"L({self.max_luminance.expand_to_ratio(10000)},{self.min_luminance.expand_to_ratio(10000)})")
 
     def to_libsvtav1_params(self) -> str:
-        return f"mastering-display=G{self.green.to_libsvtav1()}B{self.blue.to_libsvtav1()}" + \
-            f"R{self.red.to_libsvtav1()}WP{self.white_point.to_libsvtav1()}" + \
-            f"L({round(self.max_luminance.float_value, 4):.4f},{round(self.min_luminance.float_value, 4):.4f})"
+        return (f"mastering-display=G{self.green.to_libsvtav1()}B{self.blue.to_libsvtav1()}"
+                f"R{self.red.to_libsvtav1()}WP{self.white_point.to_libsvtav1()}"
+                f"L({self.max_luminance.float_value:.4f},{self.min_luminance.float_value:.4f})")
 
 
 class ContentLightLevelData:
-    def __init__(self, side_data: dict):
+    __slots__ = ("max_content", "max_average")
+
+    def __init__(self, side_data: dict) -> None:
         self.max_content: int = side_data["max_content"]
         self.max_average: int = side_data["max_average"]
 
@@ -181,8 +228,21 @@ class ContentLightLevelData:
         return f"content-light={self.max_content},{self.max_average}"
 
 
+# ffprobe side_data_type -> handler class; every handler exposes
+# to_x265_params/to_libsvtav1_params, so supporting another SEI type
+# is one entry here rather than another branch in parse_frame_data.
+# Annotated explicitly: the classes share no base, so without it mypy
+# infers type[object] and rejects the to_*_params calls on instances.
+side_data_handlers: MappingProxyType[str, Callable[[dict], Any]] = MappingProxyType({
+    "Mastering display metadata": MasteringDisplayData,
+    "Content light level metadata": ContentLightLevelData
+})
+
+
 class ColorData:
-    def __init__(self, frame_data: dict):
+    __slots__ = ("pix_fmt", "color_space", "color_primaries", "color_transfer")
+
+    def __init__(self, frame_data: dict) -> None:
         self.pix_fmt = frame_data["pix_fmt"]
         self.color_space = frame_data["color_space"]
         self.color_primaries = frame_data["color_primaries"]
@@ -197,11 +257,8 @@ class ColorData:
             f"-color_trc {self.color_transfer} -color_primaries {self.color_primaries}"
 
     def to_x265_params(self) -> str:
-        if self.color_space in x265_valid_color_matrix:
-            return f"colormatrix={self.color_space}"
-        elif self.color_space in x265_color_matrix_mapping:
-            return f"colormatrix={x265_color_matrix_mapping[self.color_space]}"
-        return ""
+        matrix = x265_color_matrix.get(self.color_space)
+        return f"colormatrix={matrix}" if matrix is not None else ""
 
     # matrix-coefficients=<arg> Matrix coefficients (CICP) of input content:
     # identity, bt709, unspecified, fcc73, bt470bg, bt601, smpte240,
@@ -224,12 +281,52 @@ class ColorData:
         return res
 
 
-def parse_frame_data(frame_data: dict):
+# Re-running the tool for the same file (e.g. while iterating on encoder
+# parameters) spawns ffprobe and re-parses its output every time, and the
+# subprocess dominates the runtime. Cache the extracted frame metadata on
+# disk, keyed by (absolute path, mtime, stream, ffprobe binary), so repeat
+# runs skip ffprobe entirely. The cache is best-effort: any I/O problem
+# simply falls back to running ffprobe.
+def frame_data_cache_path(input_file: str, stream: int, ffprobe_binary: str) -> str | None:
+    try:
+        abspath = os.path.abspath(input_file)
+        mtime_ns = os.stat(abspath).st_mtime_ns
+    except OSError:
+        return None
+    key = hashlib.blake2b(f"{abspath}|{mtime_ns}|{stream}|{ffprobe_binary}".encode()).hexdigest()
+    cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "ffmpeg-hdr-extractor")
+    return os.path.join(cache_dir, key + ".json")
+
+
+def load_cached_frame_data(cache_path: str | None) -> dict | None:
+    if cache_path is None:
+        return None
+    try:
+        with open(cache_path, "rb") as cache_file:
+            return json_loads(cache_file.read())
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached_frame_data(cache_path: str | None, frame_data: dict) -> None:
+    if cache_path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as cache_file:
+            cache_file.write(json_dumps(frame_data))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def parse_frame_data(frame_data: dict) -> None:
     color_params = ["pix_fmt", "color_space", "color_primaries", "color_transfer"]
 
-    missing_params = [x for x in color_params if x not in frame_data.keys()]
+    missing_params = set(color_params) - frame_data.keys()
     if len(missing_params) != 0:
-        print(f"Missing {missing_params} parameters in frame metadata!")
+        print(f"Missing {sorted(missing_params)} parameters in frame metadata!")
         print("Probably not an HDR stream!")
         print("Exit!")
         return
@@ -239,27 +336,30 @@ def parse_frame_data(frame_data: dict):
     print(color_data)
     print("")
 
-    x265_params: str = color_data.to_x265_params()
+    # Collect fragments and join once at the end instead of growing a
+    # string with +=, which copies the whole buffer on every append.
+    x265_parts: list[str] = [color_data.to_x265_params()]
+    libsvtav1_parts: list[str] = [color_data.to_libsvtav1_params()]
     libaom_av1_params: str = color_data.to_libaom_av1_params()
-    libsvtav1_params: str = color_data.to_libsvtav1_params()
 
-    side_data_list = frame_data["side_data_list"]
+    # Streams with color tags but no HDR side data have no "side_data_list"
+    # key at all; that is not an error, the color params alone are still useful.
+    side_data_list = frame_data.get("side_data_list") or ()
     for side_data in side_data_list:
-        if side_data["side_data_type"] == "Mastering display metadata":
-            mastering_display_data = MasteringDisplayData(side_data)
-            x265_params += ":" + mastering_display_data.to_x265_params()
-            libsvtav1_params += ":" + mastering_display_data.to_libsvtav1_params()
-            print("Mastering display metadata:")
-            print(mastering_display_data)
-            print("")
-
-        elif side_data["side_data_type"] == "Content light level metadata":
-            content_light_level_data = ContentLightLevelData(side_data)
-            x265_params += ":" + content_light_level_data.to_x265_params()
-            libsvtav1_params += ":" + content_light_level_data.to_libsvtav1_params()
-            print("Content light level metadata:")
-            print(content_light_level_data)
-            print("")
+        side_data_type = side_data["side_data_type"]
+        handler = side_data_handlers.get(side_data_type)
+        if handler is None:
+            continue
+
+        handler_data = handler(side_data)
+        x265_parts.append(handler_data.to_x265_params())
+        libsvtav1_parts.append(handler_data.to_libsvtav1_params())
+        print(f"{side_data_type}:")
+        print(handler_data)
+        print("")
+
+    x265_params: str = ":".join(part for part in x265_parts if part)
+    libsvtav1_params: str = ":".join(part for part in libsvtav1_parts if part)
 
     print(f"\nFFmpeg options: {color_data.to_ffmpeg_options()}\n")
     print(f"x265 params: {x265_params}\n")
@@ -269,7 +369,9 @@ def parse_frame_data(frame_data: dict):
     print("Done!")
 
 
-if __name__ == '__main__':
+# All work happens in main() so the module can be compiled with mypyc
+# and the script entry point stays a thin launcher.
+def main() -> None:
 
     # Initialize arguments parser
     parser = argparse.ArgumentParser(
@@ -308,37 +410,50 @@ if __name__ == '__main__':
 
     #    -hide_banner -loglevel warning Don’t display what we don’t need
     #    -select_streams v We only want the details for the video (v) stream
-    #    -print_format json Make it easier to parse
+    #    -print_format json=compact=1 Make it easier to parse, without pretty-print
+    #                   indentation so fewer bytes cross the pipe
     #    -read_intervals "%+#1" Only grab data from the first frame
     #    -show_entries ... Pick only the relevant data we want
     #    -i GlassBlowingUHD.mp4 input (-i) is our Dobly Vision demo file
     ffprobe_cmd: list[str] = [arguments.ffprobe_binary, "-hide_banner", "-loglevel", "warning",
                               "-select_streams", str(arguments.input_stream),
-                              "-print_format", "json", "-show_frames", "-read_intervals", "%+#1",
+                              "-print_format", "json=compact=1", "-show_frames", "-read_intervals", "%+#1",
                               "-show_entries",
                               "stream=codec_type:" +
                               "frame=pix_fmt,color_space,color_primaries,color_transfer,side_data_list",
                               "-i", arguments.input_file]
 
-    try:
-        result = subprocess.run(ffprobe_cmd, capture_output=True, encoding="UTF-8")
-        if result.returncode == 0 and result.stdout is not None:
-            metadata = json.loads(result.stdout)
+    cache_path = frame_data_cache_path(arguments.input_file, arguments.input_stream,
+                                       arguments.ffprobe_binary)
 
-            stream_codec_type = metadata["streams"][0]["codec_type"]
-            if stream_codec_type == "video":
+    try:
+        cached_frame_data = load_cached_frame_data(cache_path)
+        if cached_frame_data is not None:
+            print("Using cached ffprobe metadata.")
+            parse_frame_data(cached_frame_data)
+        else:
+            # No encoding= here: keep stdout as raw bytes so the JSON parser
+            # walks them directly instead of decoding the buffer twice.
+            result = subprocess.run(ffprobe_cmd, capture_output=True)
+            if result.returncode == 0 and result.stdout is not None:
+                metadata = json_loads(result.stdout)
+
+                stream_codec_type = metadata["streams"][0]["codec_type"]
+                if stream_codec_type == "video":
+
+                    frame_data = metadata["frames"][0]
+                    store_cached_frame_data(cache_path, frame_data)
+                    parse_frame_data(frame_data)
+                else:
+                    print(f"Selected stream type is \"{stream_codec_type}\"")
+                    print("Not a video stream!")
+                    print("Exit!")
 
-                parse_frame_data(metadata["frames"][0])
             else:
-                print(f"Selected stream type is \"{stream_codec_type}\"")
-                print("Not a video stream!")
+                print("Error executing ffprobe binary!")
+                print(result.stderr.decode(errors="replace"))
                 print("Exit!")
 
-        else:
-            print("Error executing ffprobe binary!")
-            print(result.stderr)
-            print("Exit!")
-
     except FileNotFoundError as err:
         print("Cannot find ffprobe binary!")
         print("Try to specify it thru -e command line argument.")
@@ -348,3 +463,6 @@ if __name__ == '__main__':
         print("Unknown error!")
         print(ex)
         print("Exit!")
+
+if __name__ == '__main__':
+    main()